@@ -1,8 +1,17 @@
 from typing import Dict, List
+import operator
+import os
+import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
 import re
 import ast
 
+# Leading number of an RSCI rank (handles formats like "37 (2021)")
+_RSCI_RE = re.compile(r'^(\d+)')
+# Points per game from a stats summary (format: "17.5 Pts, 4.2 Reb, 4.0 Ast")
+_PTS_RE = re.compile(r'^(\d+\.?\d*)\s*Pts')
+
 def parse_roster(roster_str: str) -> List[Dict]:
     """Parse roster string into list of dictionaries"""
     try:
@@ -12,173 +21,112 @@ def parse_roster(roster_str: str) -> List[Dict]:
     except (ValueError, SyntaxError):
         return []
 
-def is_good_scoring_team(row: pd.Series) -> bool:
-    """Check if team is good at scoring (top 50 in points per game)"""
-    try:
-        rank = int(row['PTS Rank'])
-        return rank <= 50
-    except (ValueError, KeyError):
-        return False
+# Number of top players (by scoring) evaluated for each team
+TOP_N = 5
 
-def forces_turnovers(row: pd.Series) -> bool:
-    """Check if team is good at forcing turnovers (top 50 in opponent turnovers)"""
-    try:
-        rank = int(row['Opponent TOV Rank'])
-        return rank <= 50
-    except (ValueError, KeyError):
-        return False
+# Player fields used by the roster analysis functions
+ROSTER_FIELDS = ['class', 'pos', 'height', 'rsci_rank', 'stats_summary']
 
-def protects_basketball(row: pd.Series) -> bool:
-    """Check if team is good at protecting the ball (top 50 in avoiding turnovers)"""
-    try:
-        rank = int(row['TOV Rank'])
-        # Note: For turnovers, a higher rank is better (means fewer turnovers)
-        return rank >= 300  # Being in the bottom 50 in turnovers is good
-    except (ValueError, KeyError):
-        return False
-
-def high_volume_three_point_team(row: pd.Series) -> bool:
-    """Check if team makes a lot of 3s (top 50 in 3PT made per game)"""
-    try:
-        rank = int(row['3P Rank'])
-        return rank <= 50
-    except (ValueError, KeyError):
-        return False
-
-def elite_offensive_rebounding(row: pd.Series) -> bool:
-    """Check if team is elite at offensive rebounding (top 50)"""
-    try:
-        rank = int(row['ORB Rank'])
-        return rank <= 50
-    except (ValueError, KeyError):
-        return False
-
-def has_experienced_core(row: pd.Series) -> bool:
-    """Check if team has more upperclassmen than lowerclassmen in top 5 scorers"""
-    try:
-        roster = parse_roster(row['roster'])
-        if not roster or len(roster) < 5:
-            return False
-        
-        # Take first 5 players (already sorted by scoring)
-        top_5 = roster[:5]
-        
-        # Count upperclassmen (JR/SR) vs lowerclassmen (FR/SO)
-        upperclassmen = sum(1 for player in top_5 if player.get('class', '') in ['JR', 'SR'])
-        lowerclassmen = sum(1 for player in top_5 if player.get('class', '') in ['FR', 'SO'])
-        
-        return upperclassmen > lowerclassmen
-    except (KeyError, AttributeError):
-        return False
+# Class years in order; a player's class code is its position here (-1 for anything else)
+CLASS_ORDER = ['FR', 'SO', 'JR', 'SR']
 
-def has_top_recruits(row: pd.Series) -> bool:
-    """Check if team has 2 or more top 100 recruits in first 5 players"""
-    try:
-        roster = parse_roster(row['roster'])
-        if not roster or len(roster) < 5:
-            return False
-        
-        # Take first 5 players
-        top_5 = roster[:5]
-        
-        # Count players with RSCI rank <= 100
-        top_recruits = 0
-        for player in top_5:
-            rsci = player.get('rsci_rank', '')
-            # Extract number from RSCI rank (handles formats like "37 (2021)")
-            match = re.match(r'(\d+)', rsci)
-            if match and int(match.group(1)) <= 100:
-                top_recruits += 1
+def build_roster_frame(rosters: List[List[Dict]]) -> pd.DataFrame:
+    """
+    Flatten parsed rosters into one row per player, keeping the first TOP_N players of each team
+    
+    Args:
+        rosters: Parsed rosters (lists of player dictionaries), one per team
         
-        return top_recruits >= 2
-    except (KeyError, AttributeError):
-        return False
+    Returns:
+        DataFrame of players with a 'team_idx' column holding the position of the player's team
+        and a 'class_code' column encoding the player's class (see CLASS_ORDER).
+        Every team in the frame has exactly TOP_N consecutive rows.
+    """
+    # Single pass over the raw player dicts; only teams with at least TOP_N players are
+    # evaluated (rosters are already sorted by scoring)
+    players = [
+        [team_idx] + [player.get(field, '') for field in ROSTER_FIELDS]
+        for team_idx, roster in enumerate(rosters)
+        if len(roster) >= TOP_N
+        for player in roster[:TOP_N]
+    ]
+    
+    roster_df = pd.DataFrame.from_records(players, columns=['team_idx'] + ROSTER_FIELDS)
+    roster_df[ROSTER_FIELDS] = roster_df[ROSTER_FIELDS].fillna('').astype(str)
+    roster_df['class_code'] = pd.Categorical(roster_df['class'], categories=CLASS_ORDER).codes.astype(np.int8)
+    return roster_df
 
-def has_scoring_guard(row: pd.Series) -> bool:
-    """Check if team has a guard in first 5 players scoring > 15 ppg"""
-    try:
-        roster = parse_roster(row['roster'])
-        if not roster or len(roster) < 5:
-            return False
-        
-        # Take first 5 players
-        top_5 = roster[:5]
-        
-        for player in top_5:
-            # Check if player is a guard
-            if player.get('pos', '') in ['G', 'PG', 'SG']:
-                # Extract points from summary (format: "17.5 Pts, 4.2 Reb, 4.0 Ast")
-                summary = player.get('stats_summary', '')
-                if summary:
-                    pts_match = re.match(r'(\d+\.?\d*)\s*Pts', summary)
-                    if pts_match and float(pts_match.group(1)) > 15:
-                        return True
-        return False
-    except (KeyError, AttributeError):
-        return False
-
-def has_size(row: pd.Series) -> bool:
-    """Check if team has 3 or more players 6-8 or taller in first 5 players"""
-    try:
-        roster = parse_roster(row['roster'])
-        if not roster or len(roster) < 5:
-            return False
-        
-        # Take first 5 players
-        top_5 = roster[:5]
-        
-        # Count players 6-8 or taller
-        tall_players = 0
-        for player in top_5:
-            height = player.get('height', '')
-            if height:
-                # Convert height (e.g., "6-8") to inches
-                try:
-                    feet, inches = map(int, height.split('-'))
-                    total_inches = feet * 12 + inches
-                    if total_inches >= 78:  # 6-6 = 78 inches
-                        tall_players += 1
-                except ValueError:
-                    continue
+def count_per_team(roster_df: pd.DataFrame, flags: pd.Series) -> pd.Series:
+    """
+    Count the players matching a condition on each team
+    
+    Args:
+        roster_df: Flattened roster frame from build_roster_frame()
+        flags: Boolean value for each player in roster_df
         
-        return tall_players >= 3
-    except (KeyError, AttributeError):
-        return False
+    Returns:
+        Series of counts indexed by team_idx
+    """
+    # Each team is a fixed window of TOP_N consecutive rows, so the counts are a
+    # row-sum over a (teams x TOP_N) view instead of a groupby
+    counts = np.asarray(flags, dtype=bool).reshape(-1, TOP_N).sum(axis=1)
+    return pd.Series(counts, index=roster_df['team_idx'].to_numpy()[::TOP_N])
 
-def good_defense(row: pd.Series) -> bool:
-    """Check if team is good at defense (top 50 in opponent points per game)"""
-    try:
-        rank = int(row['Opponent PTS Rank'])
-        return rank <= 50
-    except (ValueError, KeyError):
-        return False
+def has_experienced_core(roster_df: pd.DataFrame) -> pd.Series:
+    """Check if team has more upperclassmen than lowerclassmen in top 5 scorers"""
+    class_code = roster_df['class_code'].to_numpy()
+    
+    # Count upperclassmen (JR/SR) vs lowerclassmen (FR/SO); unknown classes (-1) count as neither
+    upperclassmen = count_per_team(roster_df, class_code >= CLASS_ORDER.index('JR'))
+    lowerclassmen = count_per_team(roster_df, (class_code >= 0) & (class_code < CLASS_ORDER.index('JR')))
+    return upperclassmen > lowerclassmen
 
-def defends_three_point(row: pd.Series) -> bool:
-    """Check if team defends the three well (top 50 in opponent 3P percentage)"""
-    try:
-        rank = int(row['Opponent 3P% Rank'])
-        return rank <= 50
-    except (ValueError, KeyError):
-        return False
+def has_top_recruits(roster_df: pd.DataFrame) -> pd.Series:
+    """Check if team has 2 or more top 100 recruits in first 5 players"""
+    rsci = pd.to_numeric(roster_df['rsci_rank'].str.extract(_RSCI_RE, expand=False), errors='coerce')
+    
+    # Count players with RSCI rank <= 100
+    is_top_recruit = rsci <= 100
+    return count_per_team(roster_df, is_top_recruit) >= 2
 
-def good_free_throw_team(row: pd.Series) -> bool:
-    """Check if team shoots free throws well (top 50 in FT percentage)"""
-    try:
-        rank = int(row['FT% Rank'])
-        return rank <= 50
-    except (ValueError, KeyError):
-        return False
+def has_scoring_guard(roster_df: pd.DataFrame) -> pd.Series:
+    """Check if team has a guard in first 5 players scoring > 15 ppg"""
+    pts = pd.to_numeric(roster_df['stats_summary'].str.extract(_PTS_RE, expand=False), errors='coerce')
+    
+    is_guard = roster_df['pos'].isin(['G', 'PG', 'SG'])
+    is_scoring_guard = is_guard & (pts > 15)
+    return count_per_team(roster_df, is_scoring_guard) >= 1
 
-# Dictionary mapping analysis functions to their column names
+def has_size(roster_df: pd.DataFrame) -> pd.Series:
+    """Check if team has 3 or more players 6-8 or taller in first 5 players"""
+    # Convert height (e.g., "6-8") to inches; unparseable heights become NaN
+    parts = roster_df['height'].str.split('-', n=1, expand=True).reindex(columns=[0, 1])
+    feet = pd.to_numeric(parts[0], errors='coerce')
+    inches = pd.to_numeric(parts[1], errors='coerce')
+    is_tall = feet * 12 + inches >= 78  # 6-6 = 78 inches
+    return count_per_team(roster_df, is_tall) >= 3
+
+# Rank-based rules: (column name, rank column, comparison, threshold)
+RANK_RULES = [
+    ('Can Score', 'PTS Rank', operator.le, 50),  # top 50 in points per game
+    ('Forces Turnovers', 'Opponent TOV Rank', operator.le, 50),  # top 50 in opponent turnovers
+    # Note: For turnovers, a higher rank is better (means fewer turnovers)
+    ('Protects the Ball', 'TOV Rank', operator.ge, 300),
+    ('High Volume 3PT Team', '3P Rank', operator.le, 50),  # top 50 in 3PT made per game
+    ('Elite Offensive Rebounding', 'ORB Rank', operator.le, 50),
+    ('Good Defense', 'Opponent PTS Rank', operator.le, 50),  # top 50 in opponent points per game
+    ('Defends Three Point', 'Opponent 3P% Rank', operator.le, 50),  # top 50 in opponent 3P percentage
+    ('Good Free Throw Team', 'FT% Rank', operator.le, 50),  # top 50 in FT percentage
+]
+
+# Rank columns used by the rank-based rules
+RANK_COLS = list(dict.fromkeys(rank_col for _, rank_col, _, _ in RANK_RULES))
+
+# Columns read from the scraped data (everything else is unused by the analysis)
+USECOLS = ['year', 'team', 'roster'] + RANK_COLS
+
+# Dictionary mapping roster analysis functions to their column names
 ANALYSIS_FUNCTIONS = {
-    'Can Score': is_good_scoring_team,
-    'Forces Turnovers': forces_turnovers,
-    'Protects the Ball': protects_basketball,
-    'High Volume 3PT Team': high_volume_three_point_team,
-    'Elite Offensive Rebounding': elite_offensive_rebounding,
-    'Good Defense': good_defense,
-    'Defends Three Point': defends_three_point,
-    'Good Free Throw Team': good_free_throw_team,
     'Experienced Core': has_experienced_core,
     'Multiple Top Recruits': has_top_recruits,
     'Has Scoring Guard': has_scoring_guard,
@@ -198,19 +146,43 @@ def analyze_teams(stats_df: pd.DataFrame) -> pd.DataFrame:
     # Create a new DataFrame with just year and team
     analysis_df = stats_df[['year', 'team']].copy()
     
-    # Apply each analysis function
+    # Coerce all rank columns to small integers once (missing, non-numeric, non-integral or
+    # out-of-range ranks become NA)
+    ranks = stats_df.reindex(columns=RANK_COLS).apply(pd.to_numeric, errors='coerce').astype('float64')
+    ranks = ranks.where(ranks.eq(ranks.round()) & ranks.abs().le(np.iinfo(np.int16).max)).astype('Int16')
+    
+    # Rank rules are plain column comparisons (missing ranks count as False)
+    for col_name, rank_col, op, threshold in RANK_RULES:
+        results = op(ranks[rank_col], threshold).fillna(False).to_numpy(dtype=bool)
+        analysis_df[col_name] = np.where(results, 'Yes', 'No')
+    
+    # Parse every roster once (no-op if already parsed) and flatten them into a single frame of players
+    rosters = stats_df['roster'].map(parse_roster).tolist()
+    roster_df = build_roster_frame(rosters)
+    
+    # Apply each roster analysis function (teams without a full top 5 get False)
     for col_name, func in ANALYSIS_FUNCTIONS.items():
-        analysis_df[col_name] = stats_df.apply(func, axis=1)
-        
-    # Convert boolean results to Yes/No
-    for col in ANALYSIS_FUNCTIONS.keys():
-        analysis_df[col] = analysis_df[col].map({True: 'Yes', False: 'No'})
+        results = func(roster_df).reindex(range(len(rosters)), fill_value=False).to_numpy(dtype=bool)
+        analysis_df[col_name] = np.where(results, 'Yes', 'No')
     
     return analysis_df
 
 if __name__ == "__main__":
-    # Read the original stats CSV
-    stats_df = pd.read_csv('final_four_teams.csv')
+    if os.path.exists('final_four_teams.parquet'):
+        # Rosters come back as nested lists and ranks as integers, so no parsing is needed.
+        # Only request columns the file has; missing rank columns become NA in analyze_teams()
+        available = set(pq.read_schema('final_four_teams.parquet').names)
+        columns = [col for col in USECOLS if col in available]
+        stats_df = pd.read_parquet('final_four_teams.parquet', columns=columns)
+    else:
+        # Read the original stats CSV, parsing each roster once while loading. Rank columns
+        # are read as-is (they may contain stray strings) and coerced in analyze_teams()
+        stats_df = pd.read_csv(
+            'final_four_teams.csv',
+            usecols=lambda col: col in USECOLS,
+            dtype={'year': 'int16', 'team': 'category'},
+            converters={'roster': parse_roster},
+        )
     
     # Perform analysis
     analysis_df = analyze_teams(stats_df)
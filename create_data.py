@@ -1,11 +1,44 @@
 import requests
+import requests_cache
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import threading
 import time
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from types import MappingProxyType
+from typing import List, Dict, Mapping
+import functools
 import urllib.parse
 import re
 
+# Ordinal suffix following a rank number (e.g. the "st" in "1st")
+_RANK_SUFFIX_RE = re.compile(r'(?<=\d)(st|nd|rd|th)')
+
+# Number of years scraped concurrently
+MAX_WORKERS = 4
+
+# Minimum number of seconds between any two requests to sports-reference.com (across all threads)
+MIN_REQUEST_INTERVAL = 3.0
+
+# Successful responses are cached on disk so re-runs skip the network (and the rate limit)
+CACHE_NAME = 'sr_cache'
+CACHE_EXPIRE_AFTER = timedelta(days=7)
+
+# Player fields scraped for each roster entry
+PLAYER_FIELDS = ['player', 'player_link', 'number', 'class', 'pos', 'height', 'weight',
+                 'hometown', 'high_school', 'rsci_rank', 'stats_summary']
+
+# Rosters are stored in Parquet as a nested list<struct> column, so readers get them without parsing
+ROSTER_TYPE = pa.list_(pa.struct([pa.field(field, pa.string()) for field in PLAYER_FIELDS]))
+
+_rate_lock = threading.Lock()
+_next_request_time = 0.0
+
 def clean_rank_text(rank_text: str) -> str:
     """
     Remove ranking suffixes (st, nd, rd, th) from a rank number
@@ -17,9 +50,36 @@ def clean_rank_text(rank_text: str) -> str:
         str: The cleaned rank number
     """
     # Remove any ordinal suffix using regex
-    return re.sub(r'(?<=\d)(st|nd|rd|th)', '', rank_text.strip())
+    return _RANK_SUFFIX_RE.sub('', rank_text.strip())
+
+def wait_for_request_slot() -> None:
+    """
+    Block until at least MIN_REQUEST_INTERVAL seconds have passed since the previous request
+    """
+    global _next_request_time
+    
+    # Reserve the next request slot under the lock, then wait for it outside the lock
+    with _rate_lock:
+        now = time.monotonic()
+        wait = _next_request_time - now
+        _next_request_time = max(now, _next_request_time) + MIN_REQUEST_INTERVAL
+    
+    if wait > 0:
+        time.sleep(wait)
+
+class RateLimitedAdapter(HTTPAdapter):
+    """HTTP adapter that spaces out requests to be respectful to the server"""
+    
+    def send(self, request, **kwargs):
+        # Only called on cache misses, so cached pages are returned without waiting
+        wait_for_request_slot()
+        return super().send(request, **kwargs)
+
+# Shared session so connections and the response cache are reused across requests and threads
+_session = requests_cache.CachedSession(CACHE_NAME, expire_after=CACHE_EXPIRE_AFTER, allowable_codes=(200,))
+_session.mount('https://', RateLimitedAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS))
 
-def get_team_stats(team_link: str, year: int) -> Dict:
+def get_team_stats(team_link: str, year: int) -> Mapping:
     """
     Get team statistics and roster from their season page
     
@@ -28,125 +88,139 @@ def get_team_stats(team_link: str, year: int) -> Dict:
         year (int): The year to get stats for
         
     Returns:
-        Dict: Dictionary containing team statistics and roster information
+        Mapping: Read-only mapping containing team statistics and roster information
     """
     # Extract school name from the link
     school = team_link.split('/')[-3]
     
+    # Failed requests raise out of the cached function, so errors are never memoized
+    try:
+        return _cached_team_stats(school, year)
+    except requests.RequestException as e:
+        print(f"Error fetching stats for {school} in {year}: {e}")
+        return {}
+
+@functools.lru_cache(maxsize=4096)
+def _cached_team_stats(school: str, year: int) -> Mapping:
+    """
+    Fetch and parse a team's season page, memoized on (school, year)
+    
+    Args:
+        school (str): The school's sports-reference identifier
+        year (int): The year to get stats for
+        
+    Returns:
+        Mapping: Read-only mapping containing team statistics and roster information
+    """
     # Construct the full URL for the team's season page
     url = f"https://www.sports-reference.com/cbb/schools/{school}/men/{year}.html"
     
-    # Add a small delay to be respectful to the server
-    time.sleep(3)
+    response = _session.get(url)
+    response.raise_for_status()
     
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        team_stats = {}
-        
-        # Get roster information
-        roster_table = soup.find('table', {'id': 'roster'})
-        if roster_table:
-            roster_data = []
-            # Get all rows from roster tbody
-            for row in roster_table.find('tbody').find_all('tr'):
-                player_data = {}
-                # Extract player information
-                player_cell = row.find('td', {'data-stat': 'player'})
-                if not player_cell:  # Check if it's in th instead of td
-                    player_cell = row.find('th', {'data-stat': 'player'})
-                
-                # Get player name, handling both link and direct text cases
-                if player_cell:
-                    player_link = player_cell.find('a')
-                    if player_link:
-                        player_data['player'] = player_link.text.strip()
-                        player_data['player_link'] = player_link.get('href', '')
-                    else:
-                        player_data['player'] = player_cell.text.strip()
-                        player_data['player_link'] = ''
-
-                # Extract other player information, handling potential missing data
-                for stat in ['number', 'class', 'pos', 'height', 'weight', 'hometown', 'high_school']:
-                    cell = row.find('td', {'data-stat': stat})
-                    player_data[stat] = cell.text.strip() if cell else ''
-                
-                # Handle RSCI ranking (might be empty with 'iz' class)
-                rsci_cell = row.find('td', {'data-stat': 'rsci'})
-                player_data['rsci_rank'] = rsci_cell.text.strip() if (rsci_cell and not 'iz' in rsci_cell.get('class', [])) else ''
-                
-                # Add stats summary
-                summary_cell = row.find('td', {'data-stat': 'summary'})
-                player_data['stats_summary'] = summary_cell.text.strip() if summary_cell else ''
-                
-                roster_data.append(player_data)
+    soup = BeautifulSoup(response.text, 'lxml')
+    team_stats = {}
+    
+    # Get roster information
+    roster_table = soup.find('table', {'id': 'roster'})
+    if roster_table:
+        roster_data = []
+        # Get all rows from roster tbody
+        for row in roster_table.find('tbody').find_all('tr'):
+            player_data = {}
+            # Index the row's cells by data-stat in one pass (the first cell for a stat wins)
+            cells = {cell.get('data-stat'): cell for cell in reversed(row.find_all('td'))}
             
-            team_stats['roster'] = roster_data
-        
-        # Find the Per Game stats table with correct ID
-        stats_table = soup.find('table', {'id': 'season-total_per_game'})
-        if not stats_table:
-            print(f"Could not find stats table for {school} in {year}")
-            return team_stats
+            # Extract player information
+            player_cell = cells.get('player')
+            if not player_cell:  # Check if it's in th instead of td
+                player_cell = row.find('th', {'data-stat': 'player'})
             
-        # Get all rows from tbody
-        tbody = stats_table.find('tbody')
-        if not tbody or len(tbody.find_all('tr')) < 4:  # We need exactly 4 rows
-            print(f"Not enough rows in stats table for {school} in {year}")
-            return team_stats
+            # Get player name, handling both link and direct text cases
+            if player_cell:
+                player_link = player_cell.find('a')
+                if player_link:
+                    player_data['player'] = player_link.text.strip()
+                    player_data['player_link'] = player_link.get('href', '')
+                else:
+                    player_data['player'] = player_cell.text.strip()
+                    player_data['player_link'] = ''
+
+            # Extract other player information, handling potential missing data
+            for stat in ['number', 'class', 'pos', 'height', 'weight', 'hometown', 'high_school']:
+                cell = cells.get(stat)
+                player_data[stat] = cell.text.strip() if cell else ''
+            
+            # Handle RSCI ranking (might be empty with 'iz' class)
+            rsci_cell = cells.get('rsci')
+            player_data['rsci_rank'] = rsci_cell.text.strip() if (rsci_cell and not 'iz' in rsci_cell.get('class', [])) else ''
             
-        rows = tbody.find_all('tr')
+            # Add stats summary
+            summary_cell = cells.get('summary')
+            player_data['stats_summary'] = summary_cell.text.strip() if summary_cell else ''
             
-        # Define the base stats we want to capture rankings for
-        base_stats = {
-            'fg_per_g': 'FG Rank',
-            'fga_per_g': 'FGA Rank',
-            'fg_pct': 'FG% Rank',
-            'fg2_per_g': '2P Rank',
-            'fg2a_per_g': '2PA Rank',
-            'fg2_pct': '2P% Rank',
-            'fg3_per_g': '3P Rank',
-            'fg3a_per_g': '3PA Rank',
-            'fg3_pct': '3P% Rank',
-            'ft_per_g': 'FT Rank',
-            'fta_per_g': 'FTA Rank',
-            'ft_pct': 'FT% Rank',
-            'orb_per_g': 'ORB Rank',
-            'drb_per_g': 'DRB Rank',
-            'trb_per_g': 'TRB Rank',
-            'ast_per_g': 'AST Rank',
-            'stl_per_g': 'STL Rank',
-            'blk_per_g': 'BLK Rank',
-            'tov_per_g': 'TOV Rank',
-            'pf_per_g': 'PF Rank',
-            'pts_per_g': 'PTS Rank'
-        }
+            roster_data.append(player_data)
         
-        # Process team rankings (row index 1 - second row)
-        team_rank_row = rows[1]  # Row with class="note"
-        for cell in team_rank_row.find_all(['th', 'td']):
-            stat_name = cell.get('data-stat', '')
-            if stat_name in base_stats:
-                rank_text = cell.text.strip()
-                team_stats[base_stats[stat_name]] = clean_rank_text(rank_text)
+        team_stats['roster'] = roster_data
+    
+    # Find the Per Game stats table with correct ID
+    stats_table = soup.find('table', {'id': 'season-total_per_game'})
+    if not stats_table:
+        print(f"Could not find stats table for {school} in {year}")
+        return MappingProxyType(team_stats)
         
-        # Process opponent rankings (row index 3 - fourth row)
-        opp_rank_row = rows[3]  # Row with class="note"
-        for cell in opp_rank_row.find_all(['th', 'td']):
-            stat_name = cell.get('data-stat', '')
-            # Remove 'opp_' prefix to match with base_stats
-            base_stat_name = stat_name.replace('opp_', '')
-            if base_stat_name in base_stats:
-                rank_text = cell.text.strip()
-                team_stats[f"Opponent {base_stats[base_stat_name]}"] = clean_rank_text(rank_text)
-                
-        return team_stats
+    # Get all rows from tbody
+    tbody = stats_table.find('tbody')
+    if not tbody or len(tbody.find_all('tr')) < 4:  # We need exactly 4 rows
+        print(f"Not enough rows in stats table for {school} in {year}")
+        return MappingProxyType(team_stats)
         
-    except requests.RequestException as e:
-        print(f"Error fetching stats for {school} in {year}: {e}")
-        return {}
+    rows = tbody.find_all('tr')
+        
+    # Define the base stats we want to capture rankings for
+    base_stats = {
+        'fg_per_g': 'FG Rank',
+        'fga_per_g': 'FGA Rank',
+        'fg_pct': 'FG% Rank',
+        'fg2_per_g': '2P Rank',
+        'fg2a_per_g': '2PA Rank',
+        'fg2_pct': '2P% Rank',
+        'fg3_per_g': '3P Rank',
+        'fg3a_per_g': '3PA Rank',
+        'fg3_pct': '3P% Rank',
+        'ft_per_g': 'FT Rank',
+        'fta_per_g': 'FTA Rank',
+        'ft_pct': 'FT% Rank',
+        'orb_per_g': 'ORB Rank',
+        'drb_per_g': 'DRB Rank',
+        'trb_per_g': 'TRB Rank',
+        'ast_per_g': 'AST Rank',
+        'stl_per_g': 'STL Rank',
+        'blk_per_g': 'BLK Rank',
+        'tov_per_g': 'TOV Rank',
+        'pf_per_g': 'PF Rank',
+        'pts_per_g': 'PTS Rank'
+    }
+    
+    # Process team rankings (row index 1 - second row)
+    team_rank_row = rows[1]  # Row with class="note"
+    for cell in team_rank_row.find_all(['th', 'td']):
+        stat_name = cell.get('data-stat', '')
+        if stat_name in base_stats:
+            rank_text = cell.text.strip()
+            team_stats[base_stats[stat_name]] = clean_rank_text(rank_text)
+    
+    # Process opponent rankings (row index 3 - fourth row)
+    opp_rank_row = rows[3]  # Row with class="note"
+    for cell in opp_rank_row.find_all(['th', 'td']):
+        stat_name = cell.get('data-stat', '')
+        # Remove 'opp_' prefix to match with base_stats
+        base_stat_name = stat_name.replace('opp_', '')
+        if base_stat_name in base_stats:
+            rank_text = cell.text.strip()
+            team_stats[f"Opponent {base_stats[base_stat_name]}"] = clean_rank_text(rank_text)
+            
+    return MappingProxyType(team_stats)
 
 def get_final_four_teams(year: int) -> List[Dict[str, str]]:
     """
@@ -160,14 +234,13 @@ def get_final_four_teams(year: int) -> List[Dict[str, str]]:
     """
     url = f"https://www.sports-reference.com/cbb/seasons/men/{year}.html"
     
-    # Add a small delay to be respectful to the server
-    time.sleep(1)
+    print(f"Scraping data for year {year}...")
     
     try:
-        response = requests.get(url)
+        response = _session.get(url)
         response.raise_for_status()
         
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = BeautifulSoup(response.text, 'lxml')
         
         # Find the paragraph containing "Final Four"
         final_four_section = soup.find('strong', string='Final Four')
@@ -208,6 +281,31 @@ def get_final_four_teams(year: int) -> List[Dict[str, str]]:
         print(f"Error fetching data for year {year}: {e}")
         return []
 
+def save_parquet(df: pd.DataFrame, path: str) -> None:
+    """
+    Save scraped teams to Parquet with a nested roster column and integer rank columns
+    
+    Args:
+        df (pd.DataFrame): DataFrame of scraped teams
+        path (str): The file to write
+    """
+    parquet_df = df.copy()
+    
+    # Store rankings as small nullable integers instead of strings
+    rank_cols = [col for col in parquet_df.columns if col.endswith('Rank')]
+    ranks = parquet_df[rank_cols].apply(pd.to_numeric, errors='coerce').astype('float64')
+    # Non-integral or out-of-range ranks can't be stored as Int16, so they become NA too
+    ranks = ranks.where(ranks.eq(ranks.round()) & ranks.abs().le(np.iinfo(np.int16).max))
+    parquet_df[rank_cols] = ranks.astype('Int16')
+    
+    # Teams whose page had no roster table get an empty roster
+    rosters = parquet_df.pop('roster') if 'roster' in parquet_df else [None] * len(parquet_df)
+    rosters = [roster if isinstance(roster, list) else [] for roster in rosters]
+    
+    table = pa.Table.from_pandas(parquet_df, preserve_index=False)
+    table = table.add_column(2, pa.field('roster', ROSTER_TYPE), pa.array(rosters, type=ROSTER_TYPE))
+    pq.write_table(table, path, compression='zstd')
+
 def get_recent_final_four_teams() -> pd.DataFrame:
     """
     Get Final Four teams for the last 3 years
@@ -218,10 +316,10 @@ def get_recent_final_four_teams() -> pd.DataFrame:
     current_year = 2025
     all_teams = []
     
-    for year in range(current_year - 15, current_year):
-        print(f"Scraping data for year {year}...")
-        teams = get_final_four_teams(year)
-        all_teams.extend(teams)
+    # Scrape years concurrently; map keeps the results in year order
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for teams in executor.map(get_final_four_teams, range(current_year - 15, current_year)):
+            all_teams.extend(teams)
     
     # Convert to DataFrame
     df = pd.DataFrame(all_teams)
@@ -230,8 +328,9 @@ def get_recent_final_four_teams() -> pd.DataFrame:
     cols = ['year', 'team'] + [col for col in df.columns if col not in ['year', 'team']]
     df = df[cols]
     
-    # Save to CSV
+    # Save to CSV, plus Parquet for the analysis (keeps rosters as nested data)
     df.to_csv('final_four_teams.csv', index=False)
+    save_parquet(df, 'final_four_teams.parquet')
     print(f"Found teams with stats:\n{df}")
     return df
 
@@ -239,4 +338,4 @@ if __name__ == "__main__":
     print("Starting to scrape Final Four teams from the last 3 years...")
     df = get_recent_final_four_teams()
     print(f"Successfully scraped {len(df)} teams")
-    print("Data saved to final_four_teams.csv")
+    print("Data saved to final_four_teams.csv and final_four_teams.parquet")